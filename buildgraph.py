@@ -0,0 +1,395 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This library is free software; you can redistribute it and/or
+#   modify it under the terms of the GNU Lesser General Public
+#   License as published by the Free Software Foundation; either
+#   version 2.1 of the License, or (at your option) any later version.
+#
+#   This library is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   Lesser General Public License for more details.
+#
+#   You should have received a copy of the GNU Lesser General Public
+#   License along with this library; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301
+#   USA
+
+import os
+import re
+import unittest
+
+from gccinvocation import GccInvocation, ParseError, cmdline_to_argv
+
+SOURCE_EXTENSIONS = ('.c', '.i', '.ii', '.cc', '.cp', '.cxx', '.cpp', '.CPP',
+                     '.c++', '.C', '.s', '.S', '.sx')
+OBJECT_EXTENSIONS = ('.o', '.lo', '.obj')
+
+def kind_of(path):
+    """
+    Classify a path as one of 'source', 'object', 'archive', 'shared' or
+    'executable', based on its name
+    """
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1]
+    if ext in SOURCE_EXTENSIONS:
+        return 'source'
+    if ext in OBJECT_EXTENSIONS:
+        return 'object'
+    if ext == '.a':
+        return 'archive'
+    if re.search(r'\.so(\.\d+)*$', name):
+        return 'shared'
+    return 'executable'
+
+def library_name(path):
+    """
+    Get the name that "-l" would use to refer to the given archive or
+    shared object (e.g. "foo" for "libfoo.so.1"), or None
+    """
+    m = re.match(r'lib(.+?)(\.a|\.so(\.\d+)*)$', os.path.basename(path))
+    if m:
+        return m.group(1)
+
+def is_archiver(progname):
+    return progname == 'ar' or progname.endswith('-ar')
+
+class BuildGraph:
+    """
+    Graph of the files within a build, with an edge from each input of
+    a compile, link or archive step to its output, i.e.
+    source -> object -> archive/shared object -> executable.
+
+    Invocations can be added at any time.  "-l" libraries are recorded by
+    name, with the link's "-L" directories, and resolved against the
+    archives and shared objects in the graph when queried, so the order
+    in which invocations arrive doesn't matter.
+    """
+    def __init__(self):
+        # node -> set of nodes it was built from
+        self._inputs = {}
+        # node -> set of nodes built from it
+        self._consumers = {}
+        # node -> {library name: list of -L directories searched for it}
+        self._libraries = {}
+        # library name -> set of nodes linked against it
+        self._library_consumers = {}
+        # library name -> set of nodes providing it
+        self._library_providers = {}
+
+    def __len__(self):
+        return len(self.nodes())
+
+    def __repr__(self):
+        return 'BuildGraph(nodes=%i)' % len(self)
+
+    def nodes(self):
+        return set(self._inputs) | set(self._consumers)
+
+    def _add_node(self, node):
+        self._inputs.setdefault(node, set())
+        self._consumers.setdefault(node, set())
+        name = library_name(node)
+        if name is not None and kind_of(node) in ('archive', 'shared'):
+            self._library_providers.setdefault(name, set()).add(node)
+
+    def add_edge(self, input_, output):
+        """
+        Record that output is built from input_
+        """
+        self._add_node(input_)
+        self._add_node(output)
+        self._inputs[output].add(input_)
+        self._consumers[input_].add(output)
+
+    def add_library(self, output, name, searchdirs=()):
+        """
+        Record that output is linked against "-l<name>", searching the
+        given (normalized) "-L" directories in order
+        """
+        self._add_node(output)
+        dirs = self._libraries.setdefault(output, {}).setdefault(name, [])
+        for searchdir in searchdirs:
+            if searchdir not in dirs:
+                dirs.append(searchdir)
+        self._library_consumers.setdefault(name, set()).add(output)
+
+    def _resolve_library(self, output, name):
+        """
+        Get the set of nodes providing "-l<name>" for the given output:
+        those in the first of its "-L" directories that has any, or
+        failing that, all nodes providing a library of that name
+        """
+        providers = self._library_providers.get(name, set())
+        for searchdir in self._libraries[output][name]:
+            found = set(provider for provider in providers
+                        if os.path.dirname(provider) == searchdir)
+            if found:
+                return found
+        return providers
+
+    def _path(self, path, cwd):
+        if cwd is not None:
+            path = os.path.join(cwd, path)
+        return os.path.normpath(path)
+
+    def add_invocation(self, gccinv, cwd=None):
+        """
+        Add the edges for a GccInvocation of a driver or linker, returning
+        the list of outputs.  Paths are taken relative to cwd, if given.
+        Other programs (e.g. cc1), and invocations that don't produce a
+        file (e.g. "-E" without "-o", or "-M"), are ignored.
+        """
+        if not (gccinv.is_driver or gccinv.is_linker):
+            return []
+        # These only produce dependency rules or diagnostics.  The option
+        # parser consumes -M and -MM, so look for them in argv:
+        if gccinv.is_driver and (set(gccinv.argv[1:])
+                                 & set(['-M', '-MM', '-fsyntax-only'])):
+            return []
+        output = gccinv.output
+        if gccinv.is_driver and set(gccinv.otherargs) & set(['-c', '-S',
+                                                              '-E']):
+            if '-E' in gccinv.otherargs:
+                suffix = None
+            elif '-S' in gccinv.otherargs:
+                suffix = '.s'
+            else:
+                suffix = '.o'
+            sources = [source for source in gccinv.sources
+                       if source != '-']
+            outputs = []
+            for source in sources:
+                if output is not None and len(sources) == 1:
+                    obj = output
+                elif suffix is not None:
+                    # The driver writes these to the current directory:
+                    obj = (os.path.splitext(os.path.basename(source))[0]
+                           + suffix)
+                else:
+                    continue
+                if obj == '-':
+                    continue
+                obj = self._path(obj, cwd)
+                self.add_edge(self._path(source, cwd), obj)
+                outputs.append(obj)
+            return outputs
+
+        # Otherwise, a link:
+        if not gccinv.sources:
+            return []
+        output = self._path(output or 'a.out', cwd)
+        for source in gccinv.sources:
+            self.add_edge(self._path(source, cwd), output)
+        searchdirs = [self._path(path, cwd) for path in gccinv.librarypaths]
+        for name in gccinv.libraries:
+            self.add_library(output, name, searchdirs)
+        return [output]
+
+    def add_archive(self, archive, members, cwd=None):
+        """
+        Record that the given archive contains the given members,
+        returning the list of outputs
+        """
+        archive = self._path(archive, cwd)
+        for member in members:
+            self.add_edge(self._path(member, cwd), archive)
+        return [archive]
+
+    def add_argv(self, argv, cwd=None):
+        """
+        Add the edges for an argv list, which may be a GCC driver or
+        linker invocation, or an "ar" invocation, returning the list of
+        outputs.  Unparseable invocations are skipped.
+        """
+        if not argv:
+            return []
+        if is_archiver(os.path.basename(argv[0])):
+            # e.g. "ar rcs libfoo.a foo.o bar.o"
+            if len(argv) > 2 and set(argv[1].lstrip('-')) & set('qr'):
+                return self.add_archive(argv[2], argv[3:], cwd)
+            return []
+        try:
+            gccinv = GccInvocation(argv)
+        except ParseError:
+            return []
+        return self.add_invocation(gccinv, cwd)
+
+    def add_cmdline(self, cmdline, cwd=None):
+        return self.add_argv(cmdline_to_argv(cmdline), cwd)
+
+    def inputs_of(self, node):
+        """
+        Get the set of nodes that the given node was directly built from,
+        including any "-l" libraries that are in the graph
+        """
+        result = set(self._inputs.get(node, ()))
+        for name in self._libraries.get(node, ()):
+            result |= self._resolve_library(node, name)
+        result.discard(node)
+        return result
+
+    def consumers_of(self, node):
+        """
+        Get the set of nodes directly built from the given node,
+        including any linked against it via "-l"
+        """
+        result = set(self._consumers.get(node, ()))
+        name = library_name(node)
+        if name is not None and node in self._library_providers.get(name,
+                                                                     ()):
+            result |= set(consumer for consumer
+                          in self._library_consumers.get(name, ())
+                          if node in self._resolve_library(consumer, name))
+        result.discard(node)
+        return result
+
+    def _walk(self, node, step):
+        seen = set()
+        pending = [node]
+        while pending:
+            for neighbor in step(pending.pop()):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    pending.append(neighbor)
+        seen.discard(node)
+        return seen
+
+    def dependencies_of(self, node, kinds=None):
+        """
+        Get the set of all nodes that the given node was transitively
+        built from, optionally restricted to the given kinds
+        """
+        result = self._walk(node, self.inputs_of)
+        if kinds is not None:
+            result = set(dep for dep in result if kind_of(dep) in kinds)
+        return result
+
+    def sources_of(self, node):
+        """
+        Get the set of source files that the given node was built from
+        """
+        return self.dependencies_of(node, kinds=('source',))
+
+    def affected_by(self, node, kinds=None):
+        """
+        Get the set of all nodes transitively built from the given node,
+        optionally restricted to the given kinds
+        """
+        result = self._walk(node, self.consumers_of)
+        if kinds is not None:
+            result = set(dep for dep in result if kind_of(dep) in kinds)
+        return result
+
+class TestKinds(unittest.TestCase):
+    def test_kind_of(self):
+        self.assertEqual(kind_of('src/foo.c'), 'source')
+        self.assertEqual(kind_of('foo.cpp'), 'source')
+        self.assertEqual(kind_of('.libs/foo.o'), 'object')
+        self.assertEqual(kind_of('libfoo.a'), 'archive')
+        self.assertEqual(kind_of('libfoo.so'), 'shared')
+        self.assertEqual(kind_of('libfoo.so.1.0.0'), 'shared')
+        self.assertEqual(kind_of('ethtool.so'), 'shared')
+        self.assertEqual(kind_of('bin/foo'), 'executable')
+
+    def test_library_name(self):
+        self.assertEqual(library_name('/usr/lib64/libfoo.so.1'), 'foo')
+        self.assertEqual(library_name('libfoo-2.0.a'), 'foo-2.0')
+        self.assertEqual(library_name('libstdc++.so'), 'stdc++')
+        self.assertEqual(library_name('ethtool.so'), None)
+        self.assertEqual(library_name('libfoo.o'), None)
+
+class TestBuildGraph(unittest.TestCase):
+    def make_graph(self):
+        graph = BuildGraph()
+        # Deliberately out of order: the program is linked before the
+        # library it uses is seen
+        graph.add_cmdline('gcc -O2 -c main.c -o main.o')
+        graph.add_cmdline('gcc -o prog main.o -L. -lutil -lm')
+        graph.add_cmdline('gcc -O2 -c util.c strings.c')
+        graph.add_cmdline('ar rcs libutil.a util.o strings.o')
+        graph.add_cmdline('gcc -fPIC -shared -Wl,-soname,libplugin.so.1'
+                          ' -o libplugin.so.1 plugin.c -L. -lutil')
+        return graph
+
+    def test_compile(self):
+        graph = BuildGraph()
+        self.assertEqual(graph.add_cmdline('gcc -c -Iinclude src/foo.c'
+                                           ' -o build/foo.o'),
+                         ['build/foo.o'])
+        self.assertEqual(graph.add_cmdline('gcc -S src/bar.c src/baz.c',
+                                           cwd='build'),
+                         ['build/bar.s', 'build/baz.s'])
+        self.assertEqual(graph.add_cmdline('gcc -E src/foo.c'), [])
+        self.assertEqual(graph.add_cmdline('gcc -x c -c - -o -'), [])
+        self.assertEqual(graph.add_cmdline('gcc -MM src/foo.c'), [])
+        self.assertEqual(graph.add_cmdline('gcc -M -Iinclude src/foo.c'
+                                           ' -o foo.d'), [])
+        self.assertEqual(graph.add_cmdline('gcc -fsyntax-only src/foo.c'),
+                         [])
+        self.assertEqual(graph.consumers_of('src/foo.c'), set(['build/foo.o']))
+        self.assertEqual(graph.inputs_of('build/foo.o'), set(['src/foo.c']))
+        self.assertEqual(graph.inputs_of('build/bar.s'),
+                         set(['build/src/bar.c']))
+
+    def test_reverse_lookups(self):
+        graph = self.make_graph()
+        self.assertEqual(graph.sources_of('prog'),
+                         set(['main.c', 'util.c', 'strings.c']))
+        self.assertEqual(graph.sources_of('libplugin.so.1'),
+                         set(['plugin.c', 'util.c', 'strings.c']))
+        self.assertEqual(graph.affected_by('strings.c'),
+                         set(['strings.o', 'libutil.a', 'prog',
+                              'libplugin.so.1']))
+        self.assertEqual(graph.affected_by('main.c',
+                                           kinds=('shared', 'executable')),
+                         set(['prog']))
+        self.assertEqual(graph.consumers_of('libutil.a'),
+                         set(['prog', 'libplugin.so.1']))
+        self.assertEqual(graph.inputs_of('prog'),
+                         set(['main.o', 'libutil.a']))
+        self.assertEqual(graph.affected_by('unknown.c'), set())
+
+    def test_library_search_paths(self):
+        graph = BuildGraph()
+        graph.add_cmdline('gcc -c a/util.c -o a/util.o')
+        graph.add_cmdline('gcc -c b/util.c -o b/util.o')
+        graph.add_cmdline('ar rcs libutil.a util.o', cwd='a')
+        graph.add_cmdline('ar rcs b/libutil.a b/util.o')
+        graph.add_cmdline('gcc -o prog main.o -La -lutil')
+        graph.add_cmdline('gcc -o other other.o -Lmissing -L../b -lutil',
+                          cwd='sub')
+        graph.add_cmdline('gcc -o any any.o -lutil')
+        self.assertEqual(graph.sources_of('prog'), set(['a/util.c']))
+        self.assertEqual(graph.sources_of('sub/other'), set(['b/util.c']))
+        # With no matching -L directory, fall back to matching by name:
+        self.assertEqual(graph.sources_of('any'),
+                         set(['a/util.c', 'b/util.c']))
+        self.assertEqual(graph.consumers_of('a/libutil.a'),
+                         set(['prog', 'any']))
+        self.assertEqual(graph.affected_by('b/util.c',
+                                           kinds=('executable',)),
+                         set(['sub/other', 'any']))
+
+    def test_bad_invocation(self):
+        graph = BuildGraph()
+        self.assertEqual(graph.add_cmdline('gcc -c a.c -o'), [])
+        self.assertEqual(graph.add_cmdline('ld a.o -o'), [])
+        self.assertEqual(len(graph), 0)
+
+    def test_collect2(self):
+        graph = BuildGraph()
+        graph.add_cmdline('/usr/libexec/gcc/x86_64-redhat-linux/5.1.1/collect2'
+                          ' --eh-frame-hdr -m elf_x86_64 -shared'
+                          ' -o .libs/libfoo.so.1.0.0 .libs/foo.o'
+                          ' -L/usr/lib64 -lz -soname libfoo.so.1')
+        graph.add_cmdline('libtool-wrapped-gcc -c foo.c')
+        graph.add_cmdline('gcc -c foo.c -fPIC -o .libs/foo.o')
+        graph.add_cmdline('/usr/bin/ld -o app app.o .libs/libfoo.so.1.0.0')
+        self.assertEqual(graph.sources_of('app'), set(['foo.c']))
+        self.assertEqual(graph.affected_by('foo.c', kinds=('shared',)),
+                         set(['.libs/libfoo.so.1.0.0']))
+        self.assertEqual(len(graph), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,431 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This library is free software; you can redistribute it and/or
+#   modify it under the terms of the GNU Lesser General Public
+#   License as published by the Free Software Foundation; either
+#   version 2.1 of the License, or (at your option) any later version.
+#
+#   This library is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   Lesser General Public License for more details.
+#
+#   You should have received a copy of the GNU Lesser General Public
+#   License along with this library; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301
+#   USA
+"""
+Extract every GCC invocation from a tree of build logs.
+
+Usage:
+  python -m buildlogs -o OUTDIR [-j JOBS] [--shard-index I --shard-count N]
+                      LOGDIR...
+  python -m buildlogs -o OUTDIR --merge --shard-count N [--store PATH]
+
+Logs are identified by their path relative to the LOGDIR they were found
+in, and assigned to one of N shards by a hash of that path, so the same
+job can be split across several hosts by giving each a different
+--shard-index, even if the hosts mount the tree at different places.
+Within a host, logs are handed out largest first to a pool of worker
+processes, each taking the next log as soon as it is idle.
+
+Each shard writes shard-I-of-N.jsonl (one JSON object per invocation)
+alongside a .progress file recording which logs are complete; rerunning the
+same command resumes an interrupted shard.  Once every shard is complete,
+--merge concatenates them into invocations.jsonl (this happens
+automatically when there is only one shard).
+"""
+
+import argparse
+from fnmatch import fnmatch
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+from gccinvocation import DRIVER_NAMES, GccInvocation, ParseError
+
+# Programs whose lines in a build log are worth parsing:
+PROGNAMES = DRIVER_NAMES + ('cc1', 'cc1plus', 'collect2')
+
+# Prefixes that may precede a command in a build log:
+LINE_PREFIXES = ('+ ', 'libtool: compile: ', 'libtool: link: ')
+
+# Extensions of arguments that look like compiler inputs:
+INPUT_EXTENSIONS = ('.c', '.i', '.ii', '.cc', '.cp', '.cxx', '.cpp', '.CPP',
+                    '.c++', '.C', '.s', '.S', '.sx', '.o', '.lo', '.a',
+                    '.so')
+
+MERGED_FILENAME = 'invocations.jsonl'
+
+def find_logs(logdirs, pattern='build.log*'):
+    """
+    Get a dict mapping the relative path of each file below the given
+    directories with a name matching the given glob pattern to its full
+    path.  Relative paths use "/" as the separator, and are relative to
+    the directory the file was found in.  Raises ValueError if two of
+    the directories contain the same relative path.
+    """
+    result = {}
+    for logdir in logdirs:
+        for dirpath, dirnames, filenames in os.walk(logdir):
+            for filename in filenames:
+                if fnmatch(filename, pattern):
+                    path = os.path.join(dirpath, filename)
+                    relpath = os.path.relpath(path, logdir)
+                    relpath = relpath.replace(os.sep, '/')
+                    if relpath in result:
+                        raise ValueError('%s found in more than one LOGDIR'
+                                         % relpath)
+                    result[relpath] = path
+    return result
+
+def shard_of(relpath, shard_count):
+    """
+    Get the index of the shard that the log with the given relative path
+    belongs to; this is stable across processes and hosts
+    """
+    key = relpath.encode('utf-8', 'surrogateescape')
+    return (zlib.crc32(key) & 0xffffffff) % shard_count
+
+def iter_invocations(lines):
+    """
+    Yield (line number, GccInvocation) pairs for the compiler and linker
+    command lines within the given lines of a build log
+    """
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        for prefix in LINE_PREFIXES:
+            if line.startswith(prefix):
+                line = line[len(prefix):].lstrip()
+        # Cheaply reject lines that don't start with a compiler before
+        # doing the full parse:
+        words = line.split()
+        if not words:
+            continue
+        if os.path.basename(words[0]) not in PROGNAMES:
+            continue
+        # Reject prose such as "gcc version 5.1.1 (GCC)", requiring at
+        # least one option or input file:
+        if not any(word.startswith('-')
+                   or os.path.splitext(word)[1] in INPUT_EXTENSIONS
+                   for word in words[1:]):
+            continue
+        try:
+            gccinv = GccInvocation.from_cmdline(line)
+        except ParseError:
+            continue
+        yield lineno, gccinv
+
+def parse_log(log):
+    """
+    Get (relpath, records) for the given (relpath, path) of a log, where
+    records is a list of JSON-serializable dicts, one per invocation
+    """
+    relpath, path = log
+    records = []
+    with open(path, errors='replace') as f:
+        for lineno, gccinv in iter_invocations(f):
+            records.append({'log': relpath,
+                            'line': lineno,
+                            'executable': gccinv.executable,
+                            'sources': gccinv.sources,
+                            'defines': gccinv.defines,
+                            'includepaths': gccinv.includepaths,
+                            'otherargs': gccinv.otherargs,
+                            'output': gccinv.output,
+                            'libraries': gccinv.libraries,
+                            'librarypaths': gccinv.librarypaths})
+    return relpath, records
+
+def shard_filename(outdir, shard_index, shard_count, suffix):
+    return os.path.join(outdir, 'shard-%05i-of-%05i%s'
+                        % (shard_index, shard_count, suffix))
+
+def read_progress(path):
+    """
+    Get (set of completed logs, size of output file covering them, size
+    of the valid part of the progress file) from the given progress file
+    """
+    done = set()
+    size = 0
+    length = 0
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Interrupted partway through writing the line
+                    break
+                offset, logpath = line.decode('utf-8').split('\t', 1)
+                done.add(json.loads(logpath))
+                size = int(offset)
+                length += len(line)
+    return done, size, length
+
+def run_shard(logdirs, outdir, shard_index=0, shard_count=1, jobs=1,
+              pattern='build.log*'):
+    """
+    Process all of the logs belonging to the given shard, resuming from
+    any earlier progress.  Returns the number of logs processed.
+    """
+    outpath = shard_filename(outdir, shard_index, shard_count, '.jsonl')
+    progresspath = shard_filename(outdir, shard_index, shard_count,
+                                  '.progress')
+    completepath = shard_filename(outdir, shard_index, shard_count,
+                                  '.complete')
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    done, size, length = read_progress(progresspath)
+    logs = [(relpath, path)
+            for relpath, path in find_logs(logdirs, pattern).items()
+            if shard_of(relpath, shard_count) == shard_index
+            and relpath not in done]
+    # Largest first, so that a big log isn't left until the end:
+    logs.sort(key=lambda log: (-os.path.getsize(log[1]), log[0]))
+
+    # Discard anything written after the last recorded progress:
+    with open(outpath, 'ab') as out:
+        out.truncate(size)
+    with open(progresspath, 'ab') as progress:
+        progress.truncate(length)
+
+    with open(outpath, 'ab') as out, open(progresspath, 'ab') as progress:
+        def record(relpath, records):
+            for rec in records:
+                out.write((json.dumps(rec) + '\n').encode('utf-8'))
+            out.flush()
+            progress.write(('%i\t%s\n' % (out.tell(), json.dumps(relpath)))
+                           .encode('utf-8'))
+            progress.flush()
+
+        if jobs == 1:
+            for log in logs:
+                record(*parse_log(log))
+        else:
+            # chunksize=1 gives dynamic load-balancing: each worker pulls
+            # the next log from the shared queue as soon as it is idle
+            with multiprocessing.Pool(jobs) as pool:
+                for relpath, records in pool.imap_unordered(parse_log, logs,
+                                                            chunksize=1):
+                    record(relpath, records)
+
+    with open(completepath, 'w'):
+        pass
+    return len(logs)
+
+def merge_shards(outdir, shard_count, store_path=None):
+    """
+    Concatenate the output of all shards into a single file, optionally
+    also saving it as an invocationstore.InvocationStore.  Raises
+    ValueError if any shard is incomplete.
+    """
+    missing = [shard_index for shard_index in range(shard_count)
+               if not os.path.exists(shard_filename(outdir, shard_index,
+                                                    shard_count,
+                                                    '.complete'))]
+    if missing:
+        raise ValueError('incomplete shards: %s'
+                         % ', '.join(str(i) for i in missing))
+    mergedpath = os.path.join(outdir, MERGED_FILENAME)
+    with open(mergedpath + '.tmp', 'wb') as merged:
+        for shard_index in range(shard_count):
+            with open(shard_filename(outdir, shard_index, shard_count,
+                                     '.jsonl'), 'rb') as f:
+                shutil.copyfileobj(f, merged)
+    os.rename(mergedpath + '.tmp', mergedpath)
+
+    if store_path:
+        from invocationstore import InvocationStore, StoredInvocation
+        store = InvocationStore()
+        with open(mergedpath) as f:
+            for line in f:
+                rec = json.loads(line)
+                store.append(StoredInvocation(
+                    *[rec[field] for field in StoredInvocation._fields]))
+        store.save(store_path)
+    return mergedpath
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Extract GCC invocations from a tree of build logs')
+    parser.add_argument('logdirs', metavar='LOGDIR', nargs='*')
+    parser.add_argument('-o', '--output-dir', required=True)
+    parser.add_argument('-j', '--jobs', type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--shard-index', type=int, default=0)
+    parser.add_argument('--shard-count', type=int, default=1)
+    parser.add_argument('--pattern', default='build.log*',
+                        help='glob for log filenames (default: %(default)s)')
+    parser.add_argument('--merge', action='store_true',
+                        help='only merge the output of completed shards')
+    parser.add_argument('--store',
+                        help='also save merged output as an InvocationStore')
+    args = parser.parse_args(argv)
+
+    if args.shard_count < 1:
+        parser.error('--shard-count must be at least 1')
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error('--shard-index must be less than --shard-count')
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+
+    if not args.merge:
+        if not args.logdirs:
+            parser.error('no log directories given')
+        try:
+            run_shard(args.logdirs, args.output_dir, args.shard_index,
+                      args.shard_count, args.jobs, args.pattern)
+        except ValueError as exc:
+            parser.exit(1, '%s: %s\n' % (parser.prog, exc))
+    if args.merge or args.shard_count == 1:
+        try:
+            merge_shards(args.output_dir, args.shard_count, args.store)
+        except ValueError as exc:
+            parser.exit(1, '%s: %s\n' % (parser.prog, exc))
+
+class TestBuildLogs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.logdir = os.path.join(self.tmpdir, 'logs')
+        self.outdir = os.path.join(self.tmpdir, 'out')
+        for i in range(6):
+            pkgdir = os.path.join(self.logdir, 'pkg%i' % i, 'x86_64')
+            os.makedirs(pkgdir)
+            with open(os.path.join(pkgdir, 'build.log'), 'w') as f:
+                f.write('Executing(%build): /bin/sh -e /var/tmp/rpm-tmp\n')
+                for j in range(i + 1):
+                    f.write('+ gcc -O2 -DPKG=%i -c file%i.c -o file%i.o\n'
+                            % (i, j, j))
+                f.write('libtool: link: gcc -shared -o libpkg.so'
+                        ' file0.o -lm\n')
+                f.write('make: Leaving directory\n')
+            with open(os.path.join(pkgdir, 'root.log'), 'w') as f:
+                f.write('gcc -c not-a-build-log.c\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_records(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_iter_invocations(self):
+        lines = ['checking for gcc... gcc\n',
+                 '+ /usr/bin/cc -DFOO -c foo.c\n',
+                 '/usr/libexec/gcc/x86_64-redhat-linux/5.1.1/cc1 -quiet'
+                 ' foo.c -o -\n',
+                 'cc\n',
+                 'gcc version 5.1.1 20150618 (Red Hat 5.1.1-4) (GCC)\n',
+                 'gcc -c a.c -o\n',
+                 'cc foo.o\n',
+                 '\n']
+        result = [(lineno, gccinv.progname, gccinv.sources)
+                  for lineno, gccinv in iter_invocations(lines)]
+        self.assertEqual(result, [(2, 'cc', ['foo.c']),
+                                  (3, 'cc1', ['foo.c']),
+                                  (7, 'cc', ['foo.o'])])
+
+    def test_single_host(self):
+        main(['-j', '2', '-o', self.outdir, self.logdir])
+        records = self.read_records(os.path.join(self.outdir,
+                                                 MERGED_FILENAME))
+        # 1+2+...+6 compiles, plus one link per package:
+        self.assertEqual(len(records), 21 + 6)
+        self.assertTrue(all(rec['log'].endswith('build.log')
+                            for rec in records))
+        self.assertIn({'log': 'pkg0/x86_64/build.log',
+                       'line': 2,
+                       'executable': 'gcc',
+                       'sources': ['file0.c'],
+                       'defines': ['PKG=0'],
+                       'includepaths': [],
+                       'otherargs': ['-O2', '-c'],
+                       'output': 'file0.o',
+                       'libraries': [],
+                       'librarypaths': []},
+                      records)
+        link = [rec for rec in records
+                if rec['log'] == 'pkg0/x86_64/build.log'
+                and rec['output'] == 'libpkg.so']
+        self.assertEqual(len(link), 1)
+        self.assertEqual(link[0]['sources'], ['file0.o'])
+        self.assertEqual(link[0]['libraries'], ['m'])
+
+    def test_sharding(self):
+        for shard_index in range(3):
+            self.assertFalse(os.path.exists(os.path.join(self.outdir,
+                                                         MERGED_FILENAME)))
+            main(['-j', '1', '--shard-index', str(shard_index),
+                  '--shard-count', '3', '-o', self.outdir, self.logdir])
+        storepath = os.path.join(self.outdir, 'invocations.store')
+        main(['-o', self.outdir, '--merge', '--shard-count', '3',
+              '--store', storepath])
+        records = self.read_records(os.path.join(self.outdir,
+                                                 MERGED_FILENAME))
+        self.assertEqual(len(records), 27)
+        self.assertEqual(len(set(rec['log'] for rec in records)), 6)
+
+        from invocationstore import InvocationStore
+        store = InvocationStore.load(storepath)
+        self.assertEqual(len(store), 27)
+        self.assertEqual(len(store.filter(otherargs=['-shared'])), 6)
+
+    def test_sharding_with_different_roots(self):
+        # Simulate hosts which mount the same tree at different places:
+        otherdir = os.path.join(self.tmpdir, 'srv', 'mnt', 'logs')
+        shutil.copytree(self.logdir, otherdir)
+        roots = [self.logdir, os.path.relpath(otherdir), otherdir + '/']
+        for shard_index, root in enumerate(roots):
+            run_shard([root], self.outdir, shard_index, 3)
+        records = self.read_records(merge_shards(self.outdir, 3))
+        self.assertEqual(len(records), 27)
+        self.assertEqual(sorted(set(rec['log'] for rec in records)),
+                         ['pkg%i/x86_64/build.log' % i for i in range(6)])
+
+    def test_resume_with_different_spelling(self):
+        self.assertEqual(run_shard([self.logdir], self.outdir), 6)
+        os.unlink(shard_filename(self.outdir, 0, 1, '.complete'))
+        self.assertEqual(run_shard([os.path.join(self.logdir, '.', '')],
+                                   self.outdir), 0)
+
+    def test_duplicate_logs(self):
+        otherdir = os.path.join(self.tmpdir, 'copy')
+        shutil.copytree(self.logdir, otherdir)
+        with self.assertRaises(ValueError):
+            find_logs([self.logdir, otherdir])
+
+    def test_merge_incomplete(self):
+        run_shard([self.logdir], self.outdir, 0, 2)
+        with self.assertRaises(ValueError):
+            merge_shards(self.outdir, 2)
+
+    def test_resume(self):
+        self.assertEqual(run_shard([self.logdir], self.outdir), 6)
+        outpath = shard_filename(self.outdir, 0, 1, '.jsonl')
+        progresspath = shard_filename(self.outdir, 0, 1, '.progress')
+        expected = self.read_records(outpath)
+
+        # Simulate being interrupted after two logs, partway through
+        # writing the output for the third:
+        with open(progresspath) as f:
+            lines = f.readlines()
+        with open(progresspath, 'w') as f:
+            f.writelines(lines[:2])
+            f.write(lines[2][:3])
+        with open(outpath, 'a') as f:
+            f.write('{"log": "trunc')
+        os.unlink(shard_filename(self.outdir, 0, 1, '.complete'))
+
+        self.assertEqual(run_shard([self.logdir], self.outdir), 4)
+        self.assertEqual(sorted(self.read_records(outpath),
+                                key=lambda rec: (rec['log'], rec['line'])),
+                         sorted(expected,
+                                key=lambda rec: (rec['log'], rec['line'])))
+        self.assertEqual(run_shard([self.logdir], self.outdir), 0)
+
+if __name__ == '__main__':
+    main()
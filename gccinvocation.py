@@ -20,6 +20,23 @@ import argparse
 import os
 import unittest
 
+DRIVER_NAMES = ('c89', 'c99', 'cc', 'gcc', 'c++', 'g++', 'xgcc')
+LINKER_NAMES = ('collect2', 'ld', 'ld.bfd', 'ld.gold')
+
+class ParseError(ValueError):
+    """
+    Raised when the arguments to a program can't be parsed
+    """
+    pass
+
+class ArgumentParser(argparse.ArgumentParser):
+    """
+    An argparse.ArgumentParser that raises ParseError on bad arguments,
+    rather than printing a usage message and exiting
+    """
+    def error(self, message):
+        raise ParseError(message)
+
 def cmdline_to_argv(cmdline):
     """
     Reconstruct an argv list from a cmdline string
@@ -67,19 +84,24 @@ class GccInvocation:
 
         self.executable = argv[0]
         self.progname = os.path.basename(self.executable)
-        DRIVER_NAMES = ('c89', 'c99', 'cc', 'gcc', 'c++', 'g++', 'xgcc')
         self.is_driver = self.progname in DRIVER_NAMES
         self.sources = []
         self.defines = []
         self.includepaths = []
         self.otherargs = []
-
-        if self.progname == 'collect2':
-            # collect2 appears to have a (mostly) different set of
+        self.output = None
+        self.libraries = []
+        self.librarypaths = []
+        self.linkerargs = []
+        self.is_linker = self.progname in LINKER_NAMES
+
+        if self.is_linker:
+            # collect2 and ld have a (mostly) different set of
             # arguments to the rest:
+            self._parse_linker_args(argv)
             return
 
-        parser = argparse.ArgumentParser(add_help=False)
+        parser = ArgumentParser(add_help=False)
 
         def add_flag_opt(flag):
             parser.add_argument(flag, action='store_true')
@@ -128,19 +150,115 @@ class GccInvocation:
 
         args, remainder = parser.parse_known_args(argv[1:])
 
+        self.output = args.o
         self.defines = args.D
         self.includepaths = args.I
 
+        # -L and -l are left in otherargs, so that the command line can
+        # be rebuilt in its original order, but for drivers they are also
+        # recorded in librarypaths and libraries:
+        remainder = iter(remainder)
         for arg in remainder:
             if arg.startswith('-') and arg != '-':
                 self.otherargs.append(arg)
+                if arg.startswith('-Wl,'):
+                    self.linkerargs += arg[4:].split(',')
+                elif self.is_driver and arg[:2] in ('-L', '-l'):
+                    value = arg[2:]
+                    if not value:
+                        value = next(remainder, None)
+                        if value is None:
+                            raise ParseError('argument %s: expected one'
+                                             ' argument' % arg)
+                        self.otherargs.append(value)
+                    if arg[:2] == '-L':
+                        self.librarypaths.append(value)
+                    else:
+                        self.libraries.append(value)
             else:
                 self.sources.append(arg)
 
+    def _parse_linker_args(self, argv):
+        # Options are matched exactly by hand, rather than with argparse,
+        # as argparse would accept e.g. "-r" and "-s" as abbreviations of
+        # "-rpath" and "-soname".
+        # Options taking a 2nd argument, either as the next argument or
+        # after an "=":
+        long_opts = ('-architecture', '-auxiliary', '-defsym',
+                     '-dynamic-linker', '-dynamic-list', '-entry',
+                     '-exclude-libs', '-filter', '-fini', '-format', '-init',
+                     '-library', '-library-path', '-Map', '-oformat',
+                     '-output', '-plugin', '-require-defined',
+                     '-retain-symbols-file', '-rpath', '-rpath-link',
+                     '-script', '-soname', '-Tbss', '-Tdata',
+                     '-Tldata-segment', '-Trodata-segment', '-Ttext',
+                     '-Ttext-segment', '-trace-symbol', '-undefined',
+                     '-version-script', '-wrap')
+        # Long options without an argument that would otherwise be taken
+        # for a single-letter option with its argument joined to it
+        # (e.g. "-export-dynamic" rather than "-e xport-dynamic"):
+        long_flags = ('-build-id', '-eh-frame-hdr', '-emit-relocs',
+                      '-enable-new-dtags', '-end-group', '-export-dynamic',
+                      '-fatal-warnings', '-help', '-Ur')
+        # Single-letter options taking a 2nd argument, which can also be
+        # joined to the option:
+        short_opts = ('-A', '-b', '-e', '-f', '-F', '-G', '-h', '-l', '-L',
+                      '-m', '-o', '-P', '-R', '-T', '-u', '-y', '-Y', '-z')
+        # Long options equivalent to the single-letter ones we record:
+        aliases = {'-output': '-o', '-library': '-l', '-library-path': '-L'}
+
+        args = iter(argv[1:])
+        for arg in args:
+            # ld accepts long options with either one or two dashes:
+            name = arg[1:] if arg.startswith('--') else arg
+            if arg.startswith('-o') and arg != '-o':
+                # ...except for those starting with "o", which need two
+                # dashes, so that e.g. "-oformat" is "-o format":
+                name, value = arg[:2], arg[2:]
+            elif '=' in name and name.split('=', 1)[0] in long_opts:
+                name, value = name.split('=', 1)
+            elif name in long_opts or arg in short_opts:
+                value = next(args, None)
+                if value is None:
+                    raise ParseError('argument %s: expected one argument'
+                                     % arg)
+            elif (arg[:2] in short_opts
+                  and name.split('=', 1)[0] not in long_flags):
+                name, value = arg[:2], arg[2:]
+            else:
+                if arg.startswith('-') and arg != '-':
+                    self.otherargs.append(arg)
+                else:
+                    self.sources.append(arg)
+                continue
+
+            name = aliases.get(name, name)
+            if name == '-o':
+                self.output = value
+            elif name == '-L':
+                self.librarypaths.append(value)
+            elif name == '-l':
+                self.libraries.append(value)
+            # (for now, drop the others on the floor)
+
     @classmethod
     def from_cmdline(cls, cmdline):
         return cls(cmdline_to_argv(cmdline))
 
+    @classmethod
+    def from_nul_separated(cls, buf, encoding=None):
+        """
+        Parse a NUL-separated argv buffer (bytes, bytearray, memoryview
+        or mmap), such as the contents of /proc/<pid>/cmdline.
+
+        This requires Python 3; see the nulargv module.
+        """
+        from nulargv import split_nul_separated
+        argv = split_nul_separated(buf, encoding)
+        if not argv:
+            raise ValueError('empty argv buffer')
+        return cls(argv)
+
     def __repr__(self):
         return ('GccInvocation(executable=%r, sources=%r,'
                 ' defines=%r, includepaths=%r, otherargs=%r)'
@@ -251,6 +369,24 @@ class TestGccInvocation(unittest.TestCase):
                           'build/temp.linux-x86_64-2.7/python-ethtool/etherinfo_ipv6_obj.o'])
         self.assertEqual(gccinv.defines, [])
         self.assertEqual(gccinv.includepaths, [])
+        self.assertEqual(gccinv.output, 'build/lib.linux-x86_64-2.7/ethtool.so')
+        self.assertEqual(gccinv.librarypaths, ['/usr/lib64'])
+        self.assertEqual(gccinv.libraries, ['nl', 'python2.7'])
+        self.assertEqual(gccinv.linkerargs, ['-z', 'relro'])
+        self.assertFalse(gccinv.is_linker)
+        # -L and -l are recorded, but also kept in otherargs:
+        self.assertEqual(gccinv.otherargs,
+                         ['-pthread', '-shared', '-Wl,-z,relro',
+                          '-L/usr/lib64', '-lnl', '-lpython2.7'])
+
+        gccinv = GccInvocation.from_cmdline('gcc -L lib foo.o -l m -lz')
+        self.assertEqual(gccinv.sources, ['foo.o'])
+        self.assertEqual(gccinv.librarypaths, ['lib'])
+        self.assertEqual(gccinv.libraries, ['m', 'z'])
+        self.assertEqual(gccinv.otherargs, ['-L', 'lib', '-l', 'm', '-lz'])
+        gccinv2 = gccinv.restrict_to_one_source('foo.o')
+        self.assertEqual(gccinv2.argv,
+                         ['gcc', '-L', 'lib', '-l', 'm', '-lz', 'foo.o'])
 
     def test_parse_cplusplus(self):
         args = ('/usr/bin/c++   -DPYSIDE_EXPORTS -DQT_GUI_LIB -DQT_CORE_LIB'
@@ -476,7 +612,101 @@ class TestGccInvocation(unittest.TestCase):
         gccinv = GccInvocation(argstr.split())
         self.assertEqual(gccinv.progname, 'collect2')
         self.assertFalse(gccinv.is_driver)
-        self.assertEqual(gccinv.sources, [])
+        self.assertTrue(gccinv.is_linker)
+        self.assertEqual(gccinv.sources, ['/tmp/cckRREmI.o'])
+        self.assertEqual(gccinv.output, '.20501.tmp')
+        self.assertEqual(gccinv.librarypaths[0],
+                         '/usr/lib/gcc/x86_64-redhat-linux/4.4.7')
+        self.assertEqual(len(gccinv.librarypaths), 6)
+        self.assertEqual(gccinv.otherargs,
+                         ['--eh-frame-hdr', '--build-id', '--hash-style=gnu',
+                          '--build-id'])
+
+    def test_collect2_with_libraries(self):
+        argstr = ('/usr/libexec/gcc/x86_64-redhat-linux/5.1.1/collect2'
+                  ' -plugin /usr/libexec/gcc/x86_64-redhat-linux/5.1.1/liblto_plugin.so'
+                  ' -plugin-opt=-pass-through=-lgcc'
+                  ' --build-id --no-add-needed --eh-frame-hdr'
+                  ' --hash-style=gnu -m elf_x86_64 -shared'
+                  ' -o .libs/libfoo.so.1.0.0'
+                  ' /usr/lib/gcc/x86_64-redhat-linux/5.1.1/../../../../lib64/crti.o'
+                  ' .libs/foo.o .libs/bar.o'
+                  ' -L/usr/lib/gcc/x86_64-redhat-linux/5.1.1'
+                  ' -lz -lm -z relro -soname libfoo.so.1 -lgcc_s -lc')
+        gccinv = GccInvocation.from_cmdline(argstr)
+        self.assertEqual(gccinv.output, '.libs/libfoo.so.1.0.0')
+        self.assertEqual(gccinv.sources,
+                         ['/usr/lib/gcc/x86_64-redhat-linux/5.1.1/../../../../lib64/crti.o',
+                          '.libs/foo.o', '.libs/bar.o'])
+        self.assertEqual(gccinv.libraries, ['z', 'm', 'gcc_s', 'c'])
+        self.assertEqual(gccinv.librarypaths,
+                         ['/usr/lib/gcc/x86_64-redhat-linux/5.1.1'])
+        self.assertIn('-shared', gccinv.otherargs)
+        self.assertIn('-plugin-opt=-pass-through=-lgcc', gccinv.otherargs)
+
+    def test_libtool_link(self):
+        # libtool passes both of these through to the linker:
+        argstr = ('/usr/libexec/gcc/x86_64-redhat-linux/5.1.1/collect2'
+                  ' -m elf_x86_64 -shared -o .libs/libfoo.so.1.0.0'
+                  ' .libs/foo.o -soname libfoo.so.1'
+                  ' -version-script .libs/libfoo.ver -lc')
+        gccinv = GccInvocation.from_cmdline(argstr)
+        self.assertEqual(gccinv.output, '.libs/libfoo.so.1.0.0')
+        self.assertEqual(gccinv.sources, ['.libs/foo.o'])
+        self.assertEqual(gccinv.libraries, ['c'])
+        self.assertEqual(gccinv.otherargs, ['-shared'])
+
+        gccinv = GccInvocation.from_cmdline(
+            'ld -shared -hlibfoo.so.1 --version-script=libfoo.ver'
+            ' -o libfoo.so.1.0.0 foo.o')
+        self.assertEqual(gccinv.output, 'libfoo.so.1.0.0')
+        self.assertEqual(gccinv.sources, ['foo.o'])
+        self.assertEqual(gccinv.otherargs, ['-shared'])
+
+    def test_ld_short_options(self):
+        # A partial link:
+        gccinv = GccInvocation.from_cmdline('ld -r -o combined.o a.o b.o')
+        self.assertEqual(gccinv.output, 'combined.o')
+        self.assertEqual(gccinv.sources, ['a.o', 'b.o'])
+        self.assertEqual(gccinv.otherargs, ['-r'])
+
+        # Stripping, with the output before and after the inputs:
+        gccinv = GccInvocation.from_cmdline('ld -s -o prog a.o')
+        self.assertEqual(gccinv.output, 'prog')
+        self.assertEqual(gccinv.sources, ['a.o'])
+        gccinv = GccInvocation.from_cmdline(
+            '/usr/libexec/gcc/x86_64-redhat-linux/5.1.1/collect2'
+            ' -s a.o -o prog')
+        self.assertEqual(gccinv.output, 'prog')
+        self.assertEqual(gccinv.sources, ['a.o'])
+        self.assertEqual(gccinv.otherargs, ['-s'])
+
+        gccinv = GccInvocation.from_cmdline(
+            'ld -d --dynamic-linker=/lib64/ld-linux-x86-64.so.2'
+            ' -rpath /opt/lib -Lfoo -L bar -lz -l m main.o')
+        self.assertEqual(gccinv.otherargs, ['-d'])
+        self.assertEqual(gccinv.sources, ['main.o'])
+        self.assertEqual(gccinv.librarypaths, ['foo', 'bar'])
+        self.assertEqual(gccinv.libraries, ['z', 'm'])
+        self.assertEqual(gccinv.output, None)
+
+        gccinv = GccInvocation.from_cmdline(
+            'ld -shared -h libfoo.so.1 -e init -u foo -y bar -T script.ld'
+            ' -Ttext 0x1000 -Map foo.map --oformat elf64-x86-64'
+            ' --dynamic-list=dyn.list --wrap malloc -export-dynamic'
+            ' --output libfoo.so.1.0 --library=z foo.o')
+        self.assertEqual(gccinv.output, 'libfoo.so.1.0')
+        self.assertEqual(gccinv.sources, ['foo.o'])
+        self.assertEqual(gccinv.libraries, ['z'])
+        self.assertEqual(gccinv.otherargs, ['-shared', '-export-dynamic'])
+
+        # "-o" followed by anything else is always the output file:
+        gccinv = GccInvocation.from_cmdline('ld -oformat foo.o')
+        self.assertEqual(gccinv.output, 'format')
+        self.assertEqual(gccinv.sources, ['foo.o'])
+
+        with self.assertRaises(ParseError):
+            GccInvocation.from_cmdline('ld a.o -o')
 
     def test_link(self):
         # From a kernel build:
@@ -629,6 +859,11 @@ class TestGccInvocation(unittest.TestCase):
         self.assertEqual(gccinv.sources,
                          ['arch/x86/purgatory/purgatory.c'])
 
+    def test_parse_error(self):
+        # A missing argument to -o:
+        with self.assertRaises(ParseError):
+            GccInvocation(['gcc', '-c', 'a.c', '-o'])
+
     def test_openssl_invocation(self):
         argstr = ('/usr/bin/gcc'
                   ' -Werror'
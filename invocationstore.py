@@ -0,0 +1,646 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This library is free software; you can redistribute it and/or
+#   modify it under the terms of the GNU Lesser General Public
+#   License as published by the Free Software Foundation; either
+#   version 2.1 of the License, or (at your option) any later version.
+#
+#   This library is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   Lesser General Public License for more details.
+#
+#   You should have received a copy of the GNU Lesser General Public
+#   License along with this library; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301
+#   USA
+
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+from gccinvocation import GccInvocation
+
+def _typecode_of_size(typecodes, itemsize):
+    for typecode in typecodes:
+        if array(typecode).itemsize == itemsize:
+            return typecode
+    raise ImportError('no array typecode of size %i' % itemsize)
+
+# Typecodes for the on-disk columns: ids are 32-bit, offsets are 64-bit
+ID_TYPECODE = _typecode_of_size('IL', 4)
+OFFSET_TYPECODE = _typecode_of_size('QL', 8)
+
+# The variable-length columns, in the order they are written to disk
+LIST_COLUMNS = ('sources', 'defines', 'includepaths', 'otherargs')
+
+MAGIC = b'GCCINVS2'
+
+# magic, byteorder, id itemsize, offset itemsize, section count
+HEADER = struct.Struct('<8s8sQQQ')
+
+StoredInvocation = namedtuple('StoredInvocation',
+                              ('executable',) + LIST_COLUMNS)
+
+def _encode(text):
+    return text.encode('utf-8', 'surrogateescape')
+
+def _decode(data):
+    return str(data, 'utf-8', 'surrogateescape')
+
+def _add_postings(postings, row, ids):
+    for id_ in set(ids):
+        rows = postings.get(id_)
+        if rows is None:
+            rows = postings[id_] = array(ID_TYPECODE)
+        rows.append(row)
+
+def _intersect(rows, other):
+    """
+    Intersect two sorted sequences of rows, giving a sorted list
+    """
+    if len(rows) > len(other):
+        rows, other = other, rows
+    if len(rows) * 16 < len(other):
+        # Few enough rows to binary-search for each of them:
+        result = []
+        for row in rows:
+            i = bisect_left(other, row)
+            if i < len(other) and other[i] == row:
+                result.append(row)
+        return result
+    other = set(other)
+    return [row for row in rows if row in other]
+
+def _writable(column, typecode):
+    """
+    Get an array for the given column, copying it out of the memory map
+    if it was loaded from disk
+    """
+    if isinstance(column, array):
+        return column
+    result = array(typecode)
+    result.frombytes(column.cast('B'))
+    return result
+
+class StringTable:
+    """
+    Dictionary-encoding of strings to integer ids.
+
+    Strings are stored as one UTF-8 blob plus an array of offsets into it,
+    so that a table loaded from disk can decode entries on demand.
+    """
+    def __init__(self, offsets=None, data=None):
+        if offsets is None:
+            offsets = array(OFFSET_TYPECODE, [0])
+            data = bytearray()
+        self._offsets = offsets
+        self._data = data
+        # Lazily built for tables loaded from disk:
+        self._ids = None
+        self._cache = {}
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _get_ids(self):
+        if self._ids is None:
+            self._ids = dict((self[i], i) for i in range(len(self)))
+        return self._ids
+
+    def __getitem__(self, id_):
+        try:
+            return self._cache[id_]
+        except KeyError:
+            pass
+        if not 0 <= id_ < len(self):
+            raise IndexError(id_)
+        text = _decode(self._data[self._offsets[id_]:self._offsets[id_ + 1]])
+        self._cache[id_] = text
+        return text
+
+    def lookup(self, text):
+        """
+        Get the id of the given string, or None if it has never been seen
+        """
+        return self._get_ids().get(text)
+
+    def intern(self, text):
+        """
+        Get the id of the given string, adding it to the table if necessary
+        """
+        ids = self._get_ids()
+        id_ = ids.get(text)
+        if id_ is None:
+            if not isinstance(self._data, bytearray):
+                self._data = bytearray(self._data)
+                self._offsets = _writable(self._offsets, OFFSET_TYPECODE)
+            id_ = len(self)
+            self._data += _encode(text)
+            self._offsets.append(len(self._data))
+            ids[text] = id_
+            self._cache[id_] = text
+        return id_
+
+class ListColumn:
+    """
+    A column holding a variable-length list of ids per row, as a flat
+    array of values plus an array of per-row offsets into it
+    """
+    def __init__(self, offsets=None, values=None):
+        if offsets is None:
+            offsets = array(OFFSET_TYPECODE, [0])
+            values = array(ID_TYPECODE)
+        self.offsets = offsets
+        self.values = values
+        # id -> sorted array of the rows containing it; built on demand
+        self._postings = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def append(self, ids):
+        self.offsets = _writable(self.offsets, OFFSET_TYPECODE)
+        self.values = _writable(self.values, ID_TYPECODE)
+        if self._postings is not None:
+            _add_postings(self._postings, len(self), ids)
+        self.values.extend(ids)
+        self.offsets.append(len(self.values))
+
+    def __getitem__(self, row):
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    def postings(self):
+        """
+        Get a dict mapping each id to the sorted array of rows
+        containing it
+        """
+        if self._postings is None:
+            postings = {}
+            # Work on lists, rather than indexing the (possibly
+            # memory-mapped) columns an element at a time:
+            offsets = self.offsets.tolist()
+            values = self.values.tolist()
+            for row in range(len(offsets) - 1):
+                _add_postings(postings, row,
+                              values[offsets[row]:offsets[row + 1]])
+            self._postings = postings
+        return self._postings
+
+    def rows_containing(self, id_):
+        """
+        Get the sorted array of rows containing the given id
+        """
+        return self.postings().get(id_, array(ID_TYPECODE))
+
+class InvocationStore:
+    """
+    Columnar, dictionary-encoded container of parsed GCC invocations.
+
+    Executables, sources, defines, include paths and other arguments are
+    stored as integer ids into a shared StringTable, so that filtering
+    and grouping operate on ids rather than on Python objects.
+    """
+    def __init__(self):
+        self.strings = StringTable()
+        self._executables = array(ID_TYPECODE)
+        self._executable_postings = None
+        self._lists = dict((name, ListColumn()) for name in LIST_COLUMNS)
+        self._mmap = None
+        self._views = []
+
+    def __len__(self):
+        return len(self._executables)
+
+    def append(self, gccinv):
+        """
+        Add a GccInvocation (or anything with the same attributes, such
+        as a StoredInvocation) as a new row
+        """
+        intern = self.strings.intern
+        self._executables = _writable(self._executables, ID_TYPECODE)
+        id_ = intern(gccinv.executable)
+        if self._executable_postings is not None:
+            _add_postings(self._executable_postings, len(self), [id_])
+        self._executables.append(id_)
+        for name in LIST_COLUMNS:
+            self._lists[name].append([intern(text)
+                                      for text in getattr(gccinv, name)])
+
+    def extend(self, gccinvs):
+        for gccinv in gccinvs:
+            self.append(gccinv)
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        strings = self.strings
+        return StoredInvocation(
+            strings[self._executables[row]],
+            *[[strings[id_] for id_ in self._lists[name][row]]
+              for name in LIST_COLUMNS])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __repr__(self):
+        return ('InvocationStore(rows=%i, strings=%i)'
+                % (len(self), len(self.strings)))
+
+    def filter(self, executable=None, **kwargs):
+        """
+        Get the sorted list of rows matching all of the given criteria.
+
+        "executable" is a single string; each keyword named after a list
+        column (e.g. defines=['NDEBUG']) gives strings that must all be
+        present in that column.
+        """
+        for name in kwargs:
+            if name not in self._lists:
+                raise ValueError('unknown column: %r' % name)
+        criteria = []
+        if executable is not None:
+            criteria.append(('executable', executable))
+        for name in LIST_COLUMNS:
+            for text in kwargs.get(name, ()):
+                criteria.append((name, text))
+        if not criteria:
+            return list(range(len(self)))
+
+        postings = []
+        for column, text in criteria:
+            id_ = self.strings.lookup(text)
+            if id_ is None:
+                return []
+            postings.append(self._postings(column).get(id_, ()))
+        # Intersect the shortest lists first:
+        postings.sort(key=len)
+        rows = list(postings[0])
+        for other in postings[1:]:
+            if not rows:
+                break
+            rows = _intersect(rows, other)
+        return rows
+
+    def _postings(self, column):
+        """
+        Get a dict mapping each id in the given column to the sorted
+        array of rows containing it
+        """
+        if column == 'executable':
+            if self._executable_postings is None:
+                postings = {}
+                for row, id_ in enumerate(self._executables.tolist()):
+                    rows = postings.get(id_)
+                    if rows is None:
+                        rows = postings[id_] = array(ID_TYPECODE)
+                    rows.append(row)
+                self._executable_postings = postings
+            return self._executable_postings
+        if column in self._lists:
+            return self._lists[column].postings()
+        raise ValueError('unknown column: %r' % column)
+
+    def _iter_column_ids(self, column, rows):
+        """
+        Yield the set of distinct ids in the given column for each row
+        """
+        if column == 'executable':
+            for row in rows:
+                yield row, (self._executables[row],)
+        elif column in self._lists:
+            listcol = self._lists[column]
+            for row in rows:
+                yield row, set(listcol[row].tolist())
+        else:
+            raise ValueError('unknown column: %r' % column)
+
+    def value_counts(self, column, rows=None):
+        """
+        Count how many of the given rows (default: all) contain each
+        distinct value of the given column, as a Counter keyed by string
+        """
+        if rows is None:
+            return Counter(dict((self.strings[id_], len(group))
+                                for id_, group
+                                in self._postings(column).items()))
+        counts = Counter()
+        for row, ids in self._iter_column_ids(column, rows):
+            counts.update(ids)
+        strings = self.strings
+        return Counter(dict((strings[id_], count)
+                            for id_, count in counts.items()))
+
+    def group_by(self, column, rows=None):
+        """
+        Get a dict mapping each distinct value of the given column to the
+        sorted list of rows (from those given; default: all) containing it
+        """
+        if rows is None:
+            return dict((self.strings[id_], list(group))
+                        for id_, group in self._postings(column).items())
+        groups = {}
+        for row, ids in self._iter_column_ids(column, rows):
+            for id_ in ids:
+                groups.setdefault(id_, []).append(row)
+        strings = self.strings
+        return dict((strings[id_], group) for id_, group in groups.items())
+
+    def _iter_sections(self):
+        yield self.strings._offsets
+        yield self.strings._data
+        yield self._executables
+        for name in LIST_COLUMNS:
+            yield self._lists[name].offsets
+            yield self._lists[name].values
+
+    def save(self, path):
+        """
+        Write the store to a compact binary file, suitable for load()
+        """
+        # Header: magic, byteorder, id and offset itemsizes, section
+        # count, then (offset, length) of each section; sections are
+        # 8-byte aligned.
+        sections = [memoryview(section).cast('B')
+                    for section in self._iter_sections()]
+        header = struct.Struct('%s%iQ' % (HEADER.format, len(sections) * 2))
+        pos = header.size
+        table = []
+        for section in sections:
+            pos += -pos % 8
+            table += [pos, len(section)]
+            pos += len(section)
+        # Write to a temporary file first, as path may be the file that
+        # this store is memory-mapped from:
+        fd, tmppath = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                       prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header.pack(MAGIC, sys.byteorder.encode('ascii'),
+                                    array(ID_TYPECODE).itemsize,
+                                    array(OFFSET_TYPECODE).itemsize,
+                                    len(sections), *table))
+                for section, offset in zip(sections, table[::2]):
+                    f.write(b'\0' * (offset - f.tell()))
+                    f.write(section)
+            os.rename(tmppath, path)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a store written by save(), memory-mapping the file rather
+        than reading it.  The columns are copied into memory only if more
+        rows are subsequently appended.  Raises ValueError if the file is
+        not a valid store.
+        """
+        typecodes = ([OFFSET_TYPECODE, 'B', ID_TYPECODE]
+                     + [OFFSET_TYPECODE, ID_TYPECODE] * len(LIST_COLUMNS))
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError('%s is not an invocation store' % path)
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, byteorder, id_itemsize, offset_itemsize,
+             count) = HEADER.unpack_from(mm)
+            if magic != MAGIC:
+                raise ValueError('%s is not an invocation store' % path)
+            if byteorder.rstrip(b'\0') != sys.byteorder.encode('ascii'):
+                raise ValueError('%s was written with a different byteorder'
+                                 % path)
+            if (id_itemsize != array(ID_TYPECODE).itemsize
+                or offset_itemsize != array(OFFSET_TYPECODE).itemsize):
+                raise ValueError('%s was written with different itemsizes'
+                                 % path)
+            if count != len(typecodes):
+                raise ValueError('%s has an unexpected number of sections'
+                                 % path)
+            tablefmt = struct.Struct('<%iQ' % (count * 2))
+            if HEADER.size + tablefmt.size > size:
+                raise ValueError('%s is truncated' % path)
+            table = tablefmt.unpack_from(mm, HEADER.size)
+        except Exception:
+            mm.close()
+            raise
+
+        view = memoryview(mm)
+        views = [view]
+        for offset, length, typecode in zip(table[::2], table[1::2],
+                                            typecodes):
+            if (offset + length > size
+                or length % array(typecode).itemsize):
+                for section in reversed(views):
+                    section.release()
+                mm.close()
+                raise ValueError('%s is truncated or corrupt' % path)
+            views.append(view[offset:offset + length].cast(typecode))
+        sections = views[1:]
+
+        store = cls()
+        store.strings = StringTable(sections[0], sections[1])
+        store._executables = sections[2]
+        for i, name in enumerate(LIST_COLUMNS):
+            store._lists[name] = ListColumn(sections[3 + 2 * i],
+                                            sections[4 + 2 * i])
+        store._mmap = mm
+        store._views = views
+        try:
+            store._check(path)
+        except ValueError:
+            store.close()
+            raise
+        return store
+
+    def _check(self, path):
+        """
+        Raise ValueError unless the offsets and ids within the columns of
+        a loaded store are consistent
+        """
+        def check_offsets(offsets, length, rows=None):
+            offsets = offsets.tolist()
+            if (not offsets or offsets[0] != 0 or offsets[-1] != length
+                or any(a > b for a, b in zip(offsets, offsets[1:]))
+                or (rows is not None and len(offsets) - 1 != rows)):
+                raise ValueError('%s has corrupt offsets' % path)
+
+        def check_ids(ids):
+            if len(ids) and max(ids) >= len(self.strings):
+                raise ValueError('%s has ids out of range' % path)
+
+        check_offsets(self.strings._offsets, len(self.strings._data))
+        check_ids(self._executables)
+        for listcol in self._lists.values():
+            check_offsets(listcol.offsets, len(listcol.values),
+                          len(self._executables))
+            check_ids(listcol.values)
+
+    def close(self):
+        """
+        Release the memory map of a store returned by load(); the store
+        can't be used afterwards
+        """
+        if self._mmap is None:
+            return
+        self.strings = StringTable()
+        self._executables = array(ID_TYPECODE)
+        self._executable_postings = None
+        self._lists = dict((name, ListColumn()) for name in LIST_COLUMNS)
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class TestInvocationStore(unittest.TestCase):
+    def make_store(self):
+        store = InvocationStore()
+        store.append(GccInvocation.from_cmdline(
+            'gcc -O2 -fno-strict-aliasing -DNDEBUG -Iinclude -c foo.c'))
+        store.append(GccInvocation.from_cmdline(
+            'g++ -O3 -fno-strict-aliasing -DNDEBUG -D_GNU_SOURCE -c bar.cc'))
+        store.append(GccInvocation.from_cmdline(
+            'gcc -O3 -fno-strict-aliasing -D_GNU_SOURCE -Iinclude -c baz.c'))
+        return store
+
+    def assert_contents(self, store):
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store[1],
+                         StoredInvocation('g++', ['bar.cc'],
+                                          ['NDEBUG', '_GNU_SOURCE'], [],
+                                          ['-O3', '-fno-strict-aliasing',
+                                           '-c']))
+        self.assertEqual(store.filter(otherargs=['-O3',
+                                                 '-fno-strict-aliasing']),
+                         [1, 2])
+        self.assertEqual(store.filter(executable='gcc',
+                                      otherargs=['-O3']),
+                         [2])
+        self.assertEqual(store.filter(defines=['NDEBUG'],
+                                      includepaths=['include']),
+                         [0])
+        self.assertEqual(store.filter(defines=['NOT_SEEN']), [])
+        self.assertEqual(store.value_counts('defines'),
+                         Counter({'NDEBUG': 2, '_GNU_SOURCE': 2}))
+        self.assertEqual(store.group_by('executable'),
+                         {'gcc': [0, 2], 'g++': [1]})
+
+    def test_append_and_query(self):
+        store = self.make_store()
+        self.assert_contents(store)
+        self.assertEqual(list(store)[0].sources, ['foo.c'])
+        self.assertEqual(store.value_counts('otherargs', rows=[0]),
+                         Counter({'-O2': 1, '-fno-strict-aliasing': 1,
+                                  '-c': 1}))
+        with self.assertRaises(ValueError):
+            store.filter(flags=['-O3'])
+
+    def test_duplicate_values_counted_once_per_row(self):
+        store = InvocationStore()
+        store.append(GccInvocation.from_cmdline(
+            'gcc -O2 -g -O2 -g -c foo.c'))
+        self.assertEqual(store.filter(otherargs=['-O2']), [0])
+        self.assertEqual(store.value_counts('otherargs')['-O2'], 1)
+
+    def test_save_and_load(self):
+        store = self.make_store()
+        fd, path = tempfile.mkstemp(suffix='.store')
+        os.close(fd)
+        try:
+            store.save(path)
+            loaded = InvocationStore.load(path)
+            self.assertIsInstance(loaded._executables, memoryview)
+            self.assert_contents(loaded)
+
+            # Appending to a loaded store works, without touching the file:
+            loaded.append(GccInvocation.from_cmdline(
+                'clang -O3 -DNDEBUG -c qux.c'))
+            self.assertEqual(len(loaded), 4)
+            self.assertEqual(loaded.filter(executable='clang'), [3])
+            self.assertEqual(loaded.filter(defines=['NDEBUG']), [0, 1, 3])
+            self.assertEqual(len(InvocationStore.load(path)), 3)
+        finally:
+            os.unlink(path)
+
+    def test_load_bad_file(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, b'not a store at all, just some bytes')
+            os.close(fd)
+            with self.assertRaises(ValueError):
+                InvocationStore.load(path)
+        finally:
+            os.unlink(path)
+
+    def test_load_truncated_file(self):
+        fd, path = tempfile.mkstemp(suffix='.store')
+        os.close(fd)
+        try:
+            self.make_store().save(path)
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Cut off within the header, the section table, and the
+            # final section (leaving a partial item):
+            for size in (0, 30, HEADER.size + 8, len(data) - 1):
+                with open(path, 'wb') as f:
+                    f.write(data[:size])
+                with self.assertRaises(ValueError):
+                    InvocationStore.load(path)
+        finally:
+            os.unlink(path)
+
+    def test_load_inconsistent_file(self):
+        fd, path = tempfile.mkstemp(suffix='.store')
+        os.close(fd)
+        try:
+            self.make_store().save(path)
+            with open(path, 'rb') as f:
+                data = bytearray(f.read())
+            table = struct.unpack_from('<%iQ' % (2 * 11), data, HEADER.size)
+            string_offsets, executables = table[0], table[4]
+            for pos, value in ((string_offsets, 1),
+                               (string_offsets + 8, 1000),
+                               (executables, 1000)):
+                corrupt = bytearray(data)
+                corrupt[pos:pos + 4] = array(ID_TYPECODE, [value]).tobytes()
+                with open(path, 'wb') as f:
+                    f.write(corrupt)
+                with self.assertRaises(ValueError):
+                    InvocationStore.load(path)
+        finally:
+            os.unlink(path)
+
+    def test_resave_and_close(self):
+        fd, path = tempfile.mkstemp(suffix='.store')
+        os.close(fd)
+        try:
+            self.make_store().save(path)
+            loaded = InvocationStore.load(path)
+            # Saving over the file that the store is mapped from:
+            loaded.save(path)
+            loaded.close()
+            loaded.close()
+            self.assertEqual(len(loaded), 0)
+            with InvocationStore.load(path) as reloaded:
+                self.assert_contents(reloaded)
+            self.assertIsNone(reloaded._mmap)
+        finally:
+            os.unlink(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+#   Copyright 2026 Red Hat, Inc.
+#
+#   This library is free software; you can redistribute it and/or
+#   modify it under the terms of the GNU Lesser General Public
+#   License as published by the Free Software Foundation; either
+#   version 2.1 of the License, or (at your option) any later version.
+#
+#   This library is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#   Lesser General Public License for more details.
+#
+#   You should have received a copy of the GNU Lesser General Public
+#   License along with this library; if not, write to the Free Software
+#   Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301
+#   USA
+"""
+Support for NUL-separated argv buffers, as found in /proc/<pid>/cmdline
+and in execve captures.  This module requires Python 3.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+from gccinvocation import DRIVER_NAMES, GccInvocation, ParseError
+
+def _decode(arg, encoding):
+    if encoding is None:
+        return os.fsdecode(arg)
+    return arg.decode(encoding, 'surrogateescape')
+
+def split_nul_separated(buf, encoding=None):
+    """
+    Split a NUL-separated argv buffer (bytes or any other bytes-like
+    object), such as the contents of /proc/<pid>/cmdline, into a list of
+    str, decoded with the filesystem encoding by default
+    """
+    args = bytes(buf).split(b'\0')
+    # The buffer is normally NUL-terminated; if not, the final argument
+    # runs to the end of it:
+    if args[-1] == b'':
+        args.pop()
+    return [_decode(arg, encoding) for arg in args]
+
+# Each record in a capture is a little-endian 32-bit length, followed by
+# that many bytes of NUL-separated argv.  Arguments may contain any byte
+# other than NUL, including newlines, so a length prefix is the only
+# unambiguous way to delimit records.
+RECORD_HEADER = struct.Struct('<I')
+
+def pack_record(argv, encoding=None):
+    """
+    Encode an argv list (of str or bytes) as a capture record
+    """
+    encoding = encoding or sys.getfilesystemencoding()
+    payload = b''.join((arg if isinstance(arg, bytes)
+                        else arg.encode(encoding, 'surrogateescape'))
+                       + b'\0'
+                       for arg in argv)
+    return RECORD_HEADER.pack(len(payload)) + payload
+
+def iter_nul_separated_records(buf, prognames=None, encoding=None):
+    """
+    Parse a capture holding many length-prefixed NUL-separated argv
+    buffers (see pack_record), yielding a GccInvocation for each.
+
+    If prognames is given, records for other programs are skipped after
+    decoding only their first argument.  Records that can't be parsed
+    are skipped.  Raises ValueError if the capture is truncated.
+    """
+    if not hasattr(buf, 'find'):
+        # e.g. a memoryview; bytes and mmap can be searched directly
+        buf = bytes(buf)
+    size = len(buf)
+    pos = 0
+    while pos < size:
+        if pos + RECORD_HEADER.size > size:
+            raise ValueError('truncated record header at offset %i' % pos)
+        length, = RECORD_HEADER.unpack_from(buf, pos)
+        start = pos + RECORD_HEADER.size
+        pos = start + length
+        if pos > size:
+            raise ValueError('truncated record at offset %i'
+                             % (start - RECORD_HEADER.size))
+        if not length:
+            continue
+        if prognames is not None:
+            end = buf.find(b'\0', start, pos)
+            if end == -1:
+                end = pos
+            if os.path.basename(_decode(buf[start:end],
+                                        encoding)) not in prognames:
+                continue
+        argv = split_nul_separated(buf[start:pos], encoding)
+        try:
+            gccinv = GccInvocation(argv)
+        except ParseError:
+            continue
+        yield gccinv
+
+def iter_nul_separated_file(path, prognames=None, encoding=None):
+    """
+    As iter_nul_separated_records, for a capture file, which is
+    memory-mapped rather than read
+    """
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # The invocations hold copies of their arguments, so the mapping
+    # can be closed once the capture has been read:
+    with mm:
+        for gccinv in iter_nul_separated_records(mm, prognames, encoding):
+            yield gccinv
+
+class TestNulSeparated(unittest.TestCase):
+    def test_from_nul_separated(self):
+        buf = (b'/usr/bin/gcc\0-DIPATH_IDSTR="QLogic kernel.org driver"\0'
+               b'-I\0some dir\0-c\0foo bar.c\0')
+        gccinv = GccInvocation.from_nul_separated(memoryview(buf))
+        self.assertEqual(gccinv.argv,
+                         ['/usr/bin/gcc',
+                          '-DIPATH_IDSTR="QLogic kernel.org driver"',
+                          '-I', 'some dir', '-c', 'foo bar.c'])
+        self.assertEqual(gccinv.progname, 'gcc')
+        self.assertEqual(gccinv.defines,
+                         ['IPATH_IDSTR="QLogic kernel.org driver"'])
+        self.assertEqual(gccinv.includepaths, ['some dir'])
+        self.assertEqual(gccinv.sources, ['foo bar.c'])
+
+    def test_unterminated_and_empty_args(self):
+        argv = split_nul_separated(b'cc1\0\0-quiet')
+        self.assertEqual(argv, ['cc1', '', '-quiet'])
+        with self.assertRaises(ValueError):
+            GccInvocation.from_nul_separated(b'')
+
+    def test_undecodable(self):
+        argv = split_nul_separated(b'gcc\0-c\0caf\xe9.c\0', 'utf-8')
+        self.assertEqual(argv[2], 'caf\udce9.c')
+
+    def test_records(self):
+        capture = (pack_record(['gcc', '-c', 'foo.c'])
+                   + pack_record([b'/bin/sh', b'-c', b'make all'])
+                   + pack_record([])
+                   + pack_record(['g++', '-DMSG="a\nb"', '-c', 'bar.cc']))
+        self.assertEqual([gccinv.sources
+                          for gccinv in iter_nul_separated_records(capture)],
+                         [['foo.c'], ['make all'], ['bar.cc']])
+        self.assertEqual([(gccinv.progname, gccinv.defines)
+                          for gccinv in iter_nul_separated_records(
+                              capture, prognames=DRIVER_NAMES)],
+                         [('gcc', []), ('g++', ['MSG="a\nb"'])])
+
+        fd, path = tempfile.mkstemp()
+        try:
+            os.write(fd, capture)
+            os.close(fd)
+            self.assertEqual([gccinv.defines
+                              for gccinv in iter_nul_separated_file(
+                                  path, prognames=DRIVER_NAMES)],
+                             [[], ['MSG="a\nb"']])
+        finally:
+            os.unlink(path)
+
+    def test_truncated_records(self):
+        capture = pack_record(['gcc', '-c', 'foo.c'])
+        for size in (2, len(capture) - 1):
+            with self.assertRaises(ValueError):
+                list(iter_nul_separated_records(capture[:size]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,8 @@ from distutils.core import setup
 setup(name='gccinvocation',
     version='0.1',
     description='Library for parsing GCC command-line options',
-    py_modules = ['gccinvocation'],
+    py_modules = ['gccinvocation', 'invocationstore', 'buildlogs',
+                  'buildgraph', 'nulargv'],
     license='LGPLv2.1+',
     author='David Malcolm <dmalcolm@redhat.com>',
     url='https://github.com/fedora-static-analysis/gccinvocation',